@@ -3,39 +3,43 @@ Brand Media Analyzer using Streamlit and Vertex AI Gemini
 """
 
 import os
+import asyncio
 import json
+import shutil
 import tempfile
-from datetime import datetime
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 import streamlit as st
+import streamlit.components.v1 as components
+import orjson
 from google.cloud import storage
-from vertex_libs.gemini_client import GeminiClient
-from google.api_core import exceptions as google_exceptions
+from google.cloud.storage import transfer_manager
+from vertex_libs.gemini_client import GeminiClient, is_rate_limit_error
+import google.auth
+from google.auth.transport import requests as google_auth_requests
 from typing import Optional
 from dotenv import load_dotenv
 import subprocess
 from pathlib import Path
 from google.genai import types
-from schemas.brand_analysis_schema import BRAND_ANALYSIS_SCHEMA
+from schemas.brand_analysis_schema import BRAND_ANALYSIS_SCHEMA_PB
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import io
-import base64
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
 
 # Load environment variables from .env file in development
 if os.path.exists(".env"):
     load_dotenv()
 
-# Initialize Vertex AI client
-gemini_client = GeminiClient()
-
 # Get environment variables with defaults for Cloud Run
-bucket_name = os.environ.get("GCP_BUCKET_NAME")
-project_id = os.environ.get("GCP_PROJECT")
+BUCKET_NAME = os.environ.get("GCP_BUCKET_NAME")
+PROJECT_ID = os.environ.get("GCP_PROJECT")
+IS_CLOUD_RUN = bool(os.environ.get("K_SERVICE"))
+# Upload videos straight from the browser to GCS (requires CORS on the bucket)
+DIRECT_UPLOAD = os.environ.get("DIRECT_UPLOAD", "false").lower() == "true"
 
 # Configure Streamlit
 st.set_page_config(
@@ -45,15 +49,129 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Browser-side uploader that sends the video directly to GCS
+_gcs_uploader = components.declare_component(
+    "gcs_uploader",
+    path=str(Path(__file__).parent / "components" / "gcs_uploader")
+)
+
+@st.cache_resource
+def get_storage_client() -> storage.Client:
+    """Return a shared storage client so the authenticated session is reused across reruns."""
+    return storage.Client()
+
+@st.cache_resource
+def get_gemini_client() -> GeminiClient:
+    """Return a shared Vertex AI Gemini client."""
+    return GeminiClient()
+
+@st.cache_resource
+def get_signing_credentials():
+    """Return the application default credentials used to sign GCS URLs."""
+    credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    return credentials
+
+@st.cache_data
+def _load_prompt() -> str:
+    """Read the analysis prompt template once; later calls are served from cache."""
+    return (Path(__file__).parent / "prompts" / "branding_prompt.md").read_text()
+
 # Add health check endpoint for Cloud Run
 def check_health():
     return {"status": "healthy"}
 
 # Add debug logging for environment variables
-if os.getenv("GCP_BUCKET_NAME"):
-    print(f"Debug: GCP bucket name is set to: {os.getenv('GCP_BUCKET_NAME')}")
-else:
-    print("Debug: GCP_BUCKET_NAME is not set")
+print(f"Debug: GCP bucket name is set to: {BUCKET_NAME}" if BUCKET_NAME else "Debug: GCP_BUCKET_NAME is not set")
+
+def _signing_kwargs() -> dict:
+    """
+    Return the extra generate_signed_url arguments needed by the default credentials.
+    
+    Raises:
+        ValueError: If the credentials cannot sign URLs (e.g. user ADC)
+    """
+    credentials = get_signing_credentials()
+    if hasattr(credentials, "signer"):
+        # Service account key / impersonated credentials sign locally
+        return {}
+    if not hasattr(credentials, "service_account_email"):
+        raise ValueError(
+            "Signed URLs require service account credentials. Set GOOGLE_APPLICATION_CREDENTIALS "
+            "to a service account key or run `gcloud auth application-default login "
+            "--impersonate-service-account=<SERVICE_ACCOUNT_EMAIL>`."
+        )
+    # Metadata-server credentials (Cloud Run) can't sign locally, so each URL is signed
+    # by an IAM signBlob call. The service account needs roles/iam.serviceAccountTokenCreator
+    # on itself and the project needs the IAM Credentials API enabled (see deploy.sh).
+    if not credentials.valid:
+        credentials.refresh(google_auth_requests.Request())
+    return {
+        "service_account_email": credentials.service_account_email,
+        "access_token": credentials.token
+    }
+
+def _generate_signed_url(blob: storage.Blob, **kwargs) -> str:
+    """Generate a one-hour V4 signed URL for the blob."""
+    kwargs.update(_signing_kwargs())
+    return blob.generate_signed_url(version="v4", expiration=timedelta(hours=1), **kwargs)
+
+def create_direct_upload(bucket_name: str, max_size_mb: int = 200) -> tuple[str, str, dict]:
+    """
+    Reserve an object name and sign a URL the browser can use to start a resumable upload.
+    
+    Args:
+        bucket_name: Name of the GCS bucket
+        max_size_mb: Largest upload GCS will accept for this URL
+        
+    Returns:
+        tuple: (upload_url, gcs_path, headers) for the pending upload; the browser
+        must send exactly these signed headers when starting the upload
+    """
+    storage_client = get_storage_client()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    blob_name = f"uploads/{timestamp}_{uuid.uuid4().hex}.mp4"
+    blob = storage_client.bucket(bucket_name).blob(blob_name)
+    headers = {
+        "x-goog-resumable": "start",
+        # Enforced by GCS, so the size limit doesn't rely on the browser check
+        "x-goog-content-length-range": f"0,{max_size_mb * 1024 * 1024}"
+    }
+    upload_url = _generate_signed_url(
+        blob,
+        method="POST",
+        content_type="video/mp4",
+        headers=headers
+    )
+    return upload_url, f"gs://{bucket_name}/{blob_name}", headers
+
+def get_playback_url(gcs_path: str, bucket_name: str, max_size_mb: int = 200) -> Optional[str]:
+    """
+    Verify a video uploaded directly by the browser and sign a playback URL for it.
+    
+    Args:
+        gcs_path: GCS path returned by create_direct_upload
+        bucket_name: Name of the GCS bucket
+        max_size_mb: Largest accepted upload; bigger objects are deleted
+        
+    Returns:
+        str: Signed playback URL, or None if the upload is missing or too large
+    """
+    try:
+        storage_client = get_storage_client()
+        blob_name = gcs_path.removeprefix(f"gs://{bucket_name}/")
+        blob = storage_client.bucket(bucket_name).get_blob(blob_name)
+        if blob is None:
+            st.error("Uploaded video was not found in storage")
+            return None
+        if blob.size > max_size_mb * 1024 * 1024:
+            blob.delete()
+            st.error(f"File size exceeds {max_size_mb}MB limit!")
+            return None
+        return _generate_signed_url(blob, method="GET")
+    
+    except Exception as e:
+        st.error(f"Error reading upload from GCS: {str(e)}")
+        return None
 
 def upload_to_gcs(video_file, bucket_name: str) -> Optional[tuple[str, str]]:
     """
@@ -64,11 +182,12 @@ def upload_to_gcs(video_file, bucket_name: str) -> Optional[tuple[str, str]]:
         bucket_name: Name of the GCS bucket
         
     Returns:
-        tuple: (public_url, gcs_path) of the uploaded file, or None if upload fails
+        tuple: (signed_url, gcs_path) of the uploaded file, or None if upload fails.
+        signed_url is None when the credentials cannot sign URLs.
     """
     try:
-        # Create storage client
-        storage_client = storage.Client()
+        # Get the shared storage client
+        storage_client = get_storage_client()
         
         # Get bucket
         bucket = storage_client.bucket(bucket_name)
@@ -76,29 +195,53 @@ def upload_to_gcs(video_file, bucket_name: str) -> Optional[tuple[str, str]]:
         # Create a unique filename using timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         blob_name = f"uploads/{timestamp}_{video_file.name}"
-        blob = bucket.blob(blob_name)
+        # Setting a chunk size enables resumable, chunked uploads
+        blob = bucket.blob(blob_name, chunk_size=8 * 1024 * 1024)
         
-        # Create a temporary file to store the video
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-            tmp_file.write(video_file.getvalue())
-            tmp_file.flush()
-            
-            # Upload the file
-            blob.upload_from_filename(tmp_file.name)
+        file_size_mb = video_file.size / (1024 * 1024)
+        video_file.seek(0)
         
-        # Clean up the temporary file
-        os.unlink(tmp_file.name)
+        if file_size_mb > 32:
+            # Large videos: upload chunks in parallel and compose them server-side.
+            # transfer_manager only accepts a filename, so spool the buffer to disk.
+            # On Cloud Run /tmp is memory-backed, so this holds a second in-memory
+            # copy of the video (up to 200MB) for the duration of the upload.
+            with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp_file:
+                shutil.copyfileobj(video_file, tmp_file)
+                tmp_file.flush()
+                transfer_manager.upload_chunks_concurrently(
+                    tmp_file.name,
+                    blob,
+                    content_type="video/mp4",
+                    chunk_size=16 * 1024 * 1024,
+                    max_workers=8,
+                    worker_type=transfer_manager.THREAD,
+                    deadline=600
+                )
+        else:
+            # Stream the uploaded buffer straight to GCS (no temp file copy)
+            blob.upload_from_file(
+                video_file,
+                size=video_file.size,
+                content_type="video/mp4",
+                timeout=600
+            )
         
-        # Make the blob publicly accessible and get the URL
-        blob.make_public()
+        # Sign a short-lived URL for playback instead of making the blob public
+        try:
+            signed_url = _generate_signed_url(blob, method="GET")
+        except Exception as e:
+            # Analysis only needs the gs:// path, so the upload still counts
+            print(f"Debug: could not sign a playback URL: {str(e)}")
+            signed_url = None
         gcs_path = f"gs://{bucket_name}/{blob_name}"
-        return blob.public_url, gcs_path
+        return signed_url, gcs_path
         
     except Exception as e:
         st.error(f"Error uploading to GCS: {str(e)}")
         return None
 
-def analyze_brand_compatibility(gcs_path: str) -> Optional[dict]:
+async def analyze_brand_compatibility_async(gcs_path: str) -> Optional[dict]:
     """
     Analyze brand compatibility from the video using Vertex AI Gemini.
     
@@ -109,9 +252,8 @@ def analyze_brand_compatibility(gcs_path: str) -> Optional[dict]:
         dict: JSON response containing the brand analysis, or None if analysis fails
     """
     try:
-        # Read the prompt template
-        with open("prompts/branding_prompt.md", "r") as f:
-            prompt_template = f.read()
+        # Load the (cached) prompt template
+        prompt_template = _load_prompt()
         
         # Create the prompt with proper content types
         contents = [
@@ -130,179 +272,336 @@ def analyze_brand_compatibility(gcs_path: str) -> Optional[dict]:
         ]
         
         # Generate analysis using Gemini with JSON configuration
-        response = gemini_client.generate_content(
+        response = await get_gemini_client().generate_content_async(
             contents,
             return_json=True,
-            json_schema=BRAND_ANALYSIS_SCHEMA
+            json_schema=BRAND_ANALYSIS_SCHEMA_PB,
+            regions=["us-central1", "us-east4", "europe-west4"],
+            timeout=60
         )
         
         # Parse the response if it's a string
         if isinstance(response, str):
             try:
-                response = json.loads(response)
-            except json.JSONDecodeError:
+                response = orjson.loads(response)
+            except (orjson.JSONDecodeError, json.JSONDecodeError):
                 st.error("Failed to parse JSON response")
                 return None
             
         return response
         
     except Exception as e:
-        st.error(f"Error analyzing brand compatibility: {str(e)}")
+        if is_rate_limit_error(e):
+            st.error("Gemini is rate limiting requests right now. Please wait a minute and try again.")
+        else:
+            st.error(f"Error analyzing brand compatibility: {str(e)}")
         return None
 
-def create_engagement_radar_chart(analysis: dict) -> go.Figure:
-    """Create a radar chart for engagement metrics."""
-    # Extract engagement metrics (this is an example, adjust based on your data)
-    metrics = {
-        "Audience Reach": 0.8,
-        "Comments": 0.7,
-        "Shares": 0.6,
-        "Likes": 0.9,
-        "Saves": 0.5
-    }
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatterpolar(
-        r=list(metrics.values()),
-        theta=list(metrics.keys()),
-        fill='toself',
-        name='Engagement Metrics'
-    ))
-    
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 1]
-            )),
-        showlegend=False,
-        title="Engagement Metrics"
+def analyze_brand_compatibility(gcs_path: str) -> Optional[dict]:
+    """Synchronous wrapper around analyze_brand_compatibility_async."""
+    return asyncio.run(analyze_brand_compatibility_async(gcs_path))
+
+@st.cache_data(show_spinner=False, max_entries=100, ttl=timedelta(hours=24))
+def analyze_brand_compatibility_cached(gcs_path: str) -> Optional[dict]:
+    """Memoized analyze_brand_compatibility; re-analyzing the same video returns instantly."""
+    return analyze_brand_compatibility(gcs_path)
+
+# Engagement metrics (this is an example, adjust based on your data)
+ENGAGEMENT_METRIC_LABELS = ["Audience Reach", "Comments", "Shares", "Likes", "Saves"]
+ENGAGEMENT_METRIC_VALUES = np.array([0.8, 0.7, 0.6, 0.9, 0.5], dtype=np.float32)
+
+# Layout shared by every chart; merged into each figure's layout at construction
+_BASE_LAYOUT = dict(
+    template="plotly_white",
+    margin=dict(l=20, r=20, t=40, b=20),
+    uirevision="static"
+)
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def create_engagement_radar_chart() -> go.Figure:
+    """Create the engagement metrics radar chart (static sample data, so it is built once)."""
+    return go.Figure(
+        data=[go.Scatterpolar(
+            r=ENGAGEMENT_METRIC_VALUES,
+            theta=ENGAGEMENT_METRIC_LABELS,
+            fill='toself',
+            name='Engagement Metrics'
+        )],
+        layout={
+            **_BASE_LAYOUT,
+            "title": "Engagement Metrics",
+            "polar": dict(radialaxis=dict(visible=True, range=[0, 1])),
+            "showlegend": False
+        }
     )
-    return fig
 
-def create_themes_bar_chart(analysis: dict) -> go.Figure:
+@st.cache_data(show_spinner=False, max_entries=100, ttl=timedelta(hours=24))
+def create_themes_bar_chart(analysis_json: str) -> go.Figure:
     """Create a bar chart for content themes."""
-    themes = analysis["temas_abordados"]
+    analysis = orjson.loads(analysis_json)
+    themes = np.asarray(analysis["temas_abordados"], dtype=str)
     # For this example, we'll assign random weights
-    weights = [len(theme) for theme in themes]  # Using length as a proxy for weight
+    weights = np.char.str_len(themes)  # Using length as a proxy for weight
     
-    fig = go.Figure(data=[
-        go.Bar(
+    return go.Figure(
+        data=[go.Bar(
             x=themes,
             y=weights,
             marker_color='rgb(26, 118, 255)'
-        )
-    ])
-    
-    fig.update_layout(
-        title="Content Themes Distribution",
-        xaxis_title="Themes",
-        yaxis_title="Relevance",
-        template='plotly_white'
+        )],
+        layout={
+            **_BASE_LAYOUT,
+            "title": "Content Themes Distribution",
+            "xaxis_title": "Themes",
+            "yaxis_title": "Relevance"
+        }
     )
-    return fig
-
-def create_audience_pie_chart(analysis: dict) -> go.Figure:
-    """Create a pie chart for audience demographics."""
-    demographics = {
-        "Age": analysis["publico_alvo_estimado"]["faixa_etaria"],
-        "Gender": analysis["publico_alvo_estimado"]["genero"],
-        "Location": analysis["publico_alvo_estimado"]["localizacao_geografica"]
-    }
+
+@dataclass(frozen=True)
+class PdfTextStyle:
+    """Font and spacing for a block of report text (sizes in points)."""
+    size: int
+    line_height: int
+    space_after: int = 0
+    style: str = ""
+    family: str = "Helvetica"
+
+# Report styles, built once at import and shared by every report
+_TITLE_STYLE = PdfTextStyle(size=24, line_height=29, space_after=30, style="B")
+_HEADING_STYLE = PdfTextStyle(size=18, line_height=22, space_after=12, style="B")
+_BODY_STYLE = PdfTextStyle(size=10, line_height=12)
+_AUDIENCE_TABLE_STYLE = dict(
+    first_row_as_headings=False,
+    text_align="CENTER",
+    line_height=18,
+    padding=(3, 6, 12, 6)
+)
+_SPACER = 12
+
+class BrandReportPDF(FPDF):
+    """PDF layout for the brand compatibility report."""
     
-    fig = go.Figure(data=[go.Pie(
-        labels=list(demographics.keys()),
-        values=[1, 1, 1],  # Equal weights for visualization
-        hole=.3
-    )])
+    def __init__(self):
+        super().__init__(unit="pt", format="letter")
+        self.set_margins(72, 72, 72)
+        self.set_auto_page_break(auto=True, margin=72)
+        # Core fonts only cover cp1252; unsupported characters are replaced below
+        self.core_fonts_encoding = "windows-1252"
     
-    fig.update_layout(
-        title="Audience Demographics"
-    )
-    return fig
+    def footer(self):
+        self.set_y(-48)
+        self.set_font("Helvetica", size=8)
+        self.cell(0, 12, f"Page {self.page_no()}", align="C")
+    
+    def write_block(self, text: str, text_style: PdfTextStyle):
+        self.set_font(text_style.family, text_style.style, text_style.size)
+        self.multi_cell(0, text_style.line_height, _pdf_text(text), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        if text_style.space_after:
+            self.ln(text_style.space_after)
+    
+    def title_text(self, text: str):
+        self.write_block(text, _TITLE_STYLE)
+    
+    def heading(self, text: str):
+        self.write_block(text, _HEADING_STYLE)
+    
+    def paragraph(self, text: str):
+        self.write_block(text, _BODY_STYLE)
+
+def _pdf_text(text: str) -> str:
+    """Replace characters the PDF core fonts cannot encode."""
+    return str(text).encode("cp1252", "replace").decode("cp1252")
 
 def generate_pdf_report(analysis: dict) -> bytes:
     """Generate a PDF report from the analysis."""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30
-    )
+    publico = analysis["publico_alvo_estimado"]
+    valores_tom = analysis["valores_e_tom"]
+    marcas = analysis["marcas_match"]
     
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=18,
-        spaceAfter=12
-    )
+    pdf = BrandReportPDF()
+    pdf.add_page()
     
     # Title
-    story.append(Paragraph("Brand Compatibility Analysis Report", title_style))
-    story.append(Spacer(1, 12))
+    pdf.title_text("Brand Compatibility Analysis Report")
+    pdf.ln(_SPACER)
     
     # Content Overview
-    story.append(Paragraph("Content Overview", heading_style))
-    story.append(Paragraph(f"Style: {analysis['estilo_conteudo']}", styles["Normal"]))
-    story.append(Spacer(1, 12))
+    pdf.heading("Content Overview")
+    pdf.paragraph(f"Style: {analysis['estilo_conteudo']}")
+    pdf.ln(_SPACER)
     
     # Themes
-    story.append(Paragraph("Main Themes:", styles["Normal"]))
-    for theme in analysis["temas_abordados"]:
-        story.append(Paragraph(f"• {theme}", styles["Normal"]))
-    story.append(Spacer(1, 12))
+    pdf.paragraph("Main Themes:")
+    pdf.paragraph("\n".join(f"• {theme}" for theme in analysis["temas_abordados"]))
+    pdf.ln(_SPACER)
     
     # Values and Tone
-    story.append(Paragraph("Values & Tone", heading_style))
-    story.append(Paragraph("Values:", styles["Normal"]))
-    for value in analysis["valores_e_tom"]["valores"]:
-        story.append(Paragraph(f"• {value}", styles["Normal"]))
-    story.append(Paragraph(f"Tone: {analysis['valores_e_tom']['tom']}", styles["Normal"]))
-    story.append(Spacer(1, 12))
+    pdf.heading("Values & Tone")
+    pdf.paragraph("Values:")
+    pdf.paragraph("\n".join(f"• {value}" for value in valores_tom["valores"]))
+    pdf.paragraph(f"Tone: {valores_tom['tom']}")
+    pdf.ln(_SPACER)
     
     # Audience Analysis
-    story.append(Paragraph("Audience Analysis", heading_style))
+    pdf.heading("Audience Analysis")
     audience_data = [
-        ["Age Range", analysis["publico_alvo_estimado"]["faixa_etaria"]],
-        ["Gender", analysis["publico_alvo_estimado"]["genero"]],
-        ["Location", analysis["publico_alvo_estimado"]["localizacao_geografica"]]
+        ["Age Range", publico["faixa_etaria"]],
+        ["Gender", publico["genero"]],
+        ["Location", publico["localizacao_geografica"]]
     ]
-    audience_table = Table(audience_data)
-    audience_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(audience_table)
-    story.append(Spacer(1, 12))
+    pdf.set_font("Helvetica", size=12)
+    with pdf.table(**_AUDIENCE_TABLE_STYLE) as table:
+        for label, value in audience_data:
+            row = table.row()
+            row.cell(label)
+            row.cell(_pdf_text(value))
+    pdf.ln(_SPACER)
     
     # Brand Matches
-    story.append(Paragraph("Brand Matches", heading_style))
-    for match in analysis["marcas_match"]:
-        story.append(Paragraph(f"Type: {match['tipo_marca']}", styles["Normal"]))
-        story.append(Paragraph("Examples:", styles["Normal"]))
-        for example in match["exemplos"]:
-            story.append(Paragraph(f"• {example}", styles["Normal"]))
-        story.append(Paragraph(f"Justification: {match['justificativa']}", styles["Normal"]))
-        story.append(Spacer(1, 12))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer.getvalue()
+    pdf.heading("Brand Matches")
+    for match in marcas:
+        pdf.paragraph(f"Type: {match['tipo_marca']}")
+        pdf.paragraph("Examples:")
+        pdf.paragraph("\n".join(f"• {example}" for example in match["exemplos"]))
+        pdf.paragraph(f"Justification: {match['justificativa']}")
+        pdf.ln(_SPACER)
+    
+    return bytes(pdf.output())
+
+@st.cache_data(show_spinner=False, max_entries=100, ttl=timedelta(hours=24))
+def _cached_pdf(analysis_json: str) -> bytes:
+    """Memoize the PDF report for a serialized analysis so reruns reuse the bytes."""
+    return generate_pdf_report(orjson.loads(analysis_json))
+
+def _tab_overview(analysis: dict):
+    """Render the Overview tab."""
+    valores_tom = analysis["valores_e_tom"]
+    st.header("Content Overview")
+
+    # Content Style and Themes
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Content Style")
+        st.write(analysis["estilo_conteudo"])
+
+        st.subheader("Main Themes")
+        for tema in analysis["temas_abordados"]:
+            st.markdown(f"- {tema}")
+
+    with col2:
+        st.subheader("Values & Tone")
+        st.write("**Values:**")
+        for valor in valores_tom["valores"]:
+            st.markdown(f"- {valor}")
+        st.write(f"**Tone:** {valores_tom['tom']}")
+
+    # Platforms and Previous Collaborations
+    st.subheader("Platforms & Collaborations")
+    col3, col4 = st.columns(2)
+    with col3:
+        st.write("**Main Platforms:**")
+        for platform in analysis["plataformas_principais"]:
+            st.markdown(f"- {platform}")
+
+    with col4:
+        st.write("**Previous Collaborations:**")
+        st.write(analysis["colaboracoes_anteriores"])
+
+def _tab_audience(analysis: dict):
+    """Render the Audience Analysis tab."""
+    publico = analysis["publico_alvo_estimado"]
+    st.header("Audience Analysis")
+
+    # Audience Demographics
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Demographics")
+        st.write(f"**Age Range:** {publico['faixa_etaria']}")
+        st.write(f"**Gender:** {publico['genero']}")
+        st.write(f"**Location:** {publico['localizacao_geografica']}")
+
+    with col2:
+        st.subheader("Interests")
+        for interesse in publico["interesses"]:
+            st.markdown(f"- {interesse}")
+
+    # Engagement
+    st.subheader("Engagement")
+    st.write(analysis["engajamento"])
+
+    # Market Niches
+    st.subheader("Market Niches")
+    for nicho in analysis["nichos_de_mercado"]:
+        st.markdown(f"- {nicho}")
+
+def _tab_brands(analysis: dict):
+    """Render the Brand Matches tab."""
+    marcas = analysis["marcas_match"]
+    st.header("Brand Match Analysis")
+
+    # Display each brand match
+    for match in marcas:
+        with st.expander(f"🎯 {match['tipo_marca']}"):
+            st.write("**Example Brands:**")
+            for exemplo in match["exemplos"]:
+                st.markdown(f"- {exemplo}")
+            st.write("**Match Justification:**")
+            st.write(match["justificativa"])
+
+    # Collaboration Types
+    st.subheader("Recommended Collaboration Types")
+    for tipo in analysis["tipos_de_colaboracao"]:
+        st.markdown(f"- {tipo}")
+
+    # Brand Image Considerations
+    st.subheader("Brand Image Considerations")
+    st.info(analysis["consideracoes_imagem_marca"])
+
+@st.fragment
+def _tab_viz(analysis_json: str):
+    """Render the Visualization tab."""
+    st.header("Data Visualization")
+
+    # Engagement Radar Chart
+    st.subheader("Engagement Analysis")
+    st.plotly_chart(create_engagement_radar_chart(), use_container_width=True)
+
+    # Themes Bar Chart
+    st.subheader("Content Themes Analysis")
+    st.plotly_chart(create_themes_bar_chart(analysis_json), use_container_width=True)
+
+    # Audience Demographics
+    st.subheader("Audience Demographics")
+    publico = orjson.loads(analysis_json)["publico_alvo_estimado"]
+    st.dataframe(
+        [
+            {"Attribute": "Age Range", "Value": publico["faixa_etaria"]},
+            {"Attribute": "Gender", "Value": publico["genero"]},
+            {"Attribute": "Location", "Value": publico["localizacao_geografica"]}
+        ],
+        hide_index=True,
+        width="stretch"
+    )
+
+@st.fragment
+def _tab_report(analysis_json: str):
+    """Render the Report tab."""
+    st.header("Analysis Report")
+
+    # Create download button; the PDF (cached per analysis) is only generated
+    # when clicked and is served from the download response, not the page
+    st.download_button(
+        label="Download PDF Report",
+        data=lambda: _cached_pdf(analysis_json),
+        file_name="brand_compatibility_analysis.pdf",
+        mime="application/pdf",
+    )
+    st.caption("Open the downloaded report in your PDF viewer.")
 
 def display_brand_analysis(analysis: dict):
     """Display the brand analysis in a user-friendly format."""
+    # Serialized once; used as the cache key for charts and the PDF report
+    analysis_json = orjson.dumps(analysis).decode()
     
     # Create tabs for different views
     tab_overview, tab_audience, tab_brands, tab_viz, tab_report = st.tabs([
@@ -313,128 +612,115 @@ def display_brand_analysis(analysis: dict):
         "📄 Report"
     ])
     
-    # Overview Tab
+    # The Visualization and Report tabs are fragments, so interacting with their
+    # charts or download button only reruns that tab; the other tabs are static
     with tab_overview:
-        st.header("Content Overview")
-        
-        # Content Style and Themes
-        col1, col2 = st.columns(2)
-        with col1:
-            st.subheader("Content Style")
-            st.write(analysis["estilo_conteudo"])
-            
-            st.subheader("Main Themes")
-            for tema in analysis["temas_abordados"]:
-                st.markdown(f"- {tema}")
-        
-        with col2:
-            st.subheader("Values & Tone")
-            st.write("**Values:**")
-            for valor in analysis["valores_e_tom"]["valores"]:
-                st.markdown(f"- {valor}")
-            st.write(f"**Tone:** {analysis['valores_e_tom']['tom']}")
-        
-        # Platforms and Previous Collaborations
-        st.subheader("Platforms & Collaborations")
-        col3, col4 = st.columns(2)
-        with col3:
-            st.write("**Main Platforms:**")
-            for platform in analysis["plataformas_principais"]:
-                st.markdown(f"- {platform}")
-        
-        with col4:
-            st.write("**Previous Collaborations:**")
-            st.write(analysis["colaboracoes_anteriores"])
-    
-    # Audience Analysis Tab
+        _tab_overview(analysis)
     with tab_audience:
-        st.header("Audience Analysis")
-        
-        # Audience Demographics
-        col1, col2 = st.columns(2)
-        with col1:
-            st.subheader("Demographics")
-            st.write(f"**Age Range:** {analysis['publico_alvo_estimado']['faixa_etaria']}")
-            st.write(f"**Gender:** {analysis['publico_alvo_estimado']['genero']}")
-            st.write(f"**Location:** {analysis['publico_alvo_estimado']['localizacao_geografica']}")
-        
-        with col2:
-            st.subheader("Interests")
-            for interesse in analysis["publico_alvo_estimado"]["interesses"]:
-                st.markdown(f"- {interesse}")
-        
-        # Engagement
-        st.subheader("Engagement")
-        st.write(analysis["engajamento"])
-        
-        # Market Niches
-        st.subheader("Market Niches")
-        for nicho in analysis["nichos_de_mercado"]:
-            st.markdown(f"- {nicho}")
-    
-    # Brand Matches Tab
+        _tab_audience(analysis)
     with tab_brands:
-        st.header("Brand Match Analysis")
-        
-        # Display each brand match
-        for match in analysis["marcas_match"]:
-            with st.expander(f"🎯 {match['tipo_marca']}"):
-                st.write("**Example Brands:**")
-                for exemplo in match["exemplos"]:
-                    st.markdown(f"- {exemplo}")
-                st.write("**Match Justification:**")
-                st.write(match["justificativa"])
-        
-        # Collaboration Types
-        st.subheader("Recommended Collaboration Types")
-        for tipo in analysis["tipos_de_colaboracao"]:
-            st.markdown(f"- {tipo}")
-        
-        # Brand Image Considerations
-        st.subheader("Brand Image Considerations")
-        st.info(analysis["consideracoes_imagem_marca"])
-    
-    # Visualization Tab
+        _tab_brands(analysis)
     with tab_viz:
-        st.header("Data Visualization")
-        
-        # Engagement Radar Chart
-        st.subheader("Engagement Analysis")
-        st.plotly_chart(create_engagement_radar_chart(analysis), use_container_width=True)
-        
-        # Themes Bar Chart
-        st.subheader("Content Themes Analysis")
-        st.plotly_chart(create_themes_bar_chart(analysis), use_container_width=True)
-        
-        # Audience Pie Chart
-        st.subheader("Audience Demographics")
-        st.plotly_chart(create_audience_pie_chart(analysis), use_container_width=True)
-    
-    # Report Tab
+        _tab_viz(analysis_json)
     with tab_report:
-        st.header("Analysis Report")
-        
-        # Generate PDF
-        pdf_bytes = generate_pdf_report(analysis)
+        _tab_report(analysis_json)
+
+def _receive_server_upload():
+    """Upload through st.file_uploader; the app server relays the bytes to GCS."""
+    video_file = st.file_uploader("", type=["mp4"])
+    
+    if video_file:
+        file_size = video_file.size / (1024 * 1024)  # Size in MB
+        if file_size > 200:
+            st.error("File size exceeds 200MB limit!")
+            st.session_state.video_url = None
+            st.session_state.uploaded_file_id = None
+        elif st.session_state.get("uploaded_file_id") != video_file.file_id:
+            # Upload to GCS once per selected file, not on every rerun
+            upload_result = upload_to_gcs(video_file, BUCKET_NAME)
+            if upload_result:
+                video_url, gcs_path = upload_result
+                # Without signing credentials, play the uploaded buffer instead
+                st.session_state.video_url = video_url or video_file
+                st.session_state.gcs_path = gcs_path
+                st.session_state.uploaded_file_id = video_file.file_id
+            else:
+                st.error("Failed to upload video")
+                st.session_state.video_url = None
+    else:
+        st.session_state.video_url = None
+        st.session_state.uploaded_file_id = None
+
+def _receive_direct_upload():
+    """Upload from the browser straight to GCS; only the resulting gs:// path reaches the server."""
+    # Signed upload URLs expire after an hour, so refresh them well before that
+    pending = st.session_state.get("direct_upload")
+    if pending is None or datetime.now() - pending["created"] > timedelta(minutes=50):
+        try:
+            upload_url, gcs_path, headers = create_direct_upload(BUCKET_NAME)
+        except Exception as e:
+            # Signing failed (e.g. user ADC), so relay the upload through the app server
+            print(f"Debug: direct upload unavailable: {str(e)}")
+            _receive_server_upload()
+            return
+        pending = {
+            "upload_url": upload_url,
+            "gcs_path": gcs_path,
+            "headers": headers,
+            "created": datetime.now()
+        }
+        st.session_state.direct_upload = pending
+    
+    result = _gcs_uploader(
+        upload_url=pending["upload_url"],
+        gcs_path=pending["gcs_path"],
+        headers=pending["headers"],
+        max_size_mb=200,
+        key="gcs_uploader",
+        default=None
+    )
+    
+    # Only accept the object this session signed an upload URL for
+    if result and result.get("gcs_path") == pending["gcs_path"]:
+        video_url = get_playback_url(pending["gcs_path"], BUCKET_NAME)
+        st.session_state.video_url = video_url
+        if video_url:
+            st.session_state.gcs_path = pending["gcs_path"]
+        # Reserve a fresh object name for the next upload
+        del st.session_state.direct_upload
+
+@st.fragment
+def _sidebar_uploader():
+    """Render the upload sidebar; uploader interactions only rerun this fragment."""
+    st.markdown("### Upload Content")
+    st.markdown("Upload a video to analyze for brand compatibility.")
+    st.markdown("**Note:** Maximum file size is 200MB")
+    previous_url = st.session_state.video_url
+    
+    if DIRECT_UPLOAD:
+        _receive_direct_upload()
+    else:
+        _receive_server_upload()
+    
+    if st.session_state.video_url:
+        # Display video in sidebar (a signed URL, or the uploaded file as a fallback)
+        st.video(st.session_state.video_url)
         
-        # Create download button
-        st.download_button(
-            label="Download PDF Report",
-            data=pdf_bytes,
-            file_name="brand_compatibility_analysis.pdf",
-            mime="application/pdf",
-        )
+        # Add some spacing
+        st.markdown("<br>", unsafe_allow_html=True)
         
-        # Preview section
-        st.subheader("Report Preview")
-        # Convert PDF to base64 for preview
-        b64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
-        pdf_display = f'<iframe src="data:application/pdf;base64,{b64_pdf}" width="100%" height="800" type="application/pdf"></iframe>'
-        st.markdown(pdf_display, unsafe_allow_html=True)
+        # Analyze button
+        if st.button("Analyze Brand Compatibility", type="primary"):
+            st.session_state.analyze_requested = True
+            st.rerun()
+    
+    # The main area depends on the uploaded video, so refresh the whole app when it changes
+    if st.session_state.video_url != previous_url:
+        st.rerun()
 
 def main():
     # Handle health check requests (Cloud Run requirement)
-    if os.environ.get("K_SERVICE"):  # We're running in Cloud Run
+    if IS_CLOUD_RUN:
         if "health" in st.query_params:
             st.json(check_health())
             return
@@ -461,7 +747,7 @@ def main():
     st.markdown("<h1 class='main-title'>🎯 Brand Media Analyzer</h1>", unsafe_allow_html=True)
     
     # Check for required environment variables
-    if not bucket_name or not project_id:
+    if not BUCKET_NAME or not PROJECT_ID:
         st.error("""
             Missing required environment variables. Please ensure the following are set:
             - GCP_BUCKET_NAME: The Google Cloud Storage bucket name
@@ -475,48 +761,18 @@ def main():
     
     # Sidebar for video upload
     with st.sidebar:
-        st.markdown("### Upload Content")
-        st.markdown("Upload a video to analyze for brand compatibility.")
-        st.markdown("**Note:** Maximum file size is 200MB")
-        video_file = st.file_uploader("", type=["mp4"])
-        
-        if video_file:
-            file_size = len(video_file.getvalue()) / (1024 * 1024)  # Size in MB
-            if file_size > 200:
-                st.error("File size exceeds 200MB limit!")
-                video_file = None
-                st.session_state.video_url = None
-            else:
-                # Upload to GCS first
-                upload_result = upload_to_gcs(video_file, bucket_name)
-                if upload_result:
-                    public_url, gcs_path = upload_result
-                    st.session_state.video_url = public_url
-                    st.session_state.gcs_path = gcs_path
-                    
-                    # Display video in sidebar
-                    st.video(st.session_state.video_url)
-                    
-                    # Add some spacing
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    
-                    # Analyze button
-                    process_button = st.button("Analyze Brand Compatibility", type="primary")
-                else:
-                    st.error("Failed to upload video")
-                    process_button = False
-        else:
-            process_button = False
-            st.session_state.video_url = None
+        _sidebar_uploader()
     
     # Main content area
     if st.session_state.video_url:
-        if process_button:
+        if st.session_state.pop("analyze_requested", False):
             try:
                 with st.spinner("Analyzing your content..."):
                     # Analyze brand compatibility using the GCS path
-                    analysis = analyze_brand_compatibility(st.session_state.gcs_path)
+                    analysis = analyze_brand_compatibility_cached(st.session_state.gcs_path)
                     if not analysis:
+                        # Don't keep this failed analysis in the cache
+                        analyze_brand_compatibility_cached.clear(st.session_state.gcs_path)
                         return
                     
                     # Display results
@@ -524,7 +780,7 @@ def main():
                     
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
-                if os.environ.get("K_SERVICE"):  # We're running in Cloud Run
+                if IS_CLOUD_RUN:
                     print(f"Error in Cloud Run: {str(e)}")  # Log to Cloud Run logs
     else:
         # Show welcome message and instructions
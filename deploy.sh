@@ -9,9 +9,22 @@ fi
 # Read .env file and format variables for Cloud Run
 ENV_VARS=$(cat .env | grep -v '^#' | xargs | sed 's/ /,/g')
 
+# Runtime service account (defaults to the Compute Engine default service account)
+PROJECT_ID=$(gcloud config get-value project)
+PROJECT_NUMBER=$(gcloud projects describe "$PROJECT_ID" --format="value(projectNumber)")
+SERVICE_ACCOUNT=${SERVICE_ACCOUNT:-"${PROJECT_NUMBER}-compute@developer.gserviceaccount.com"}
+
+# Signed URLs are signed through the IAM Credentials API (signBlob) on Cloud Run,
+# which needs the API enabled and the service account allowed to sign as itself
+gcloud services enable iamcredentials.googleapis.com
+gcloud iam service-accounts add-iam-policy-binding "$SERVICE_ACCOUNT" \
+    --member="serviceAccount:$SERVICE_ACCOUNT" \
+    --role="roles/iam.serviceAccountTokenCreator"
+
 # Deploy to Cloud Run
 gcloud run deploy video-highlights \
     --source . \
+    --service-account="$SERVICE_ACCOUNT" \
     --platform managed \
     --region us-central1 \
     --set-env-vars="$ENV_VARS" \
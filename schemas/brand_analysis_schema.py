@@ -147,4 +147,7 @@ BRAND_ANALYSIS_SCHEMA = {
         "tipos_de_colaboracao",
         "consideracoes_imagem_marca"
     ]
-} 
\ No newline at end of file
+} 
+
+# Pre-built schema object so the SDK doesn't convert the dict on every request
+BRAND_ANALYSIS_SCHEMA_PB = types.Schema(**BRAND_ANALYSIS_SCHEMA)
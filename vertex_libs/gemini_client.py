@@ -16,16 +16,50 @@
 
 import os
 import json
+import asyncio
 import logging
 from typing import Optional, List, Union, Dict, Tuple
 from dataclasses import dataclass
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import RetryError, retry, retry_if_exception, stop_after_attempt, wait_exponential
 from google import genai
 from google.genai import types
 import tiktoken
+import httpx
 import re
 from dotenv import load_dotenv
 
+def is_rate_limit_error(error: Optional[BaseException]) -> bool:
+    """
+    Check whether an error, or anything in its cause chain, is a 429 / quota error.
+    
+    Unwraps the RetryError raised once all retry attempts are used up, so callers can
+    pass whatever generate_content or generate_content_async raised.
+    """
+    while error is not None:
+        if isinstance(error, RetryError):
+            error = error.last_attempt.exception()
+            continue
+        # Covers genai ClientError and google.api_core ResourceExhausted
+        if getattr(error, "code", None) == 429:
+            return True
+        error = error.__cause__
+    return False
+
+def _is_retryable_error(error: Optional[BaseException]) -> bool:
+    """
+    Decide whether a failed region sweep is worth retrying.
+    
+    Rate limits (429) and timeouts already fell through every region, so retrying
+    them only multiplies the wait before the caller sees the error.
+    """
+    if is_rate_limit_error(error):
+        return False
+    while error is not None:
+        if isinstance(error, (httpx.TimeoutException, TimeoutError, asyncio.TimeoutError)):
+            return False
+        error = error.__cause__
+    return True
+
 @dataclass
 class TokenCount:
     """Token count information for a response."""
@@ -97,12 +131,14 @@ class GeminiClient:
             safety_settings=self.safety_settings
         )
 
-    def _initialize_client(self, region: str):
-        """Initialize Gemini client with the specified region."""
+    def _initialize_client(self, region: str, timeout: Optional[float] = None):
+        """Initialize Gemini client with the specified region and optional request timeout in seconds."""
+        http_options = types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None
         return genai.Client(
             vertexai=True,
             project=self.project_id,
-            location=region
+            location=region,
+            http_options=http_options
         )
 
     def count_tokens(self, contents: List[types.Content]) -> TokenCount:
@@ -179,15 +215,18 @@ class GeminiClient:
             return {"text": response.text}
         return {"text": str(response)}
 
-    @retry(wait=wait_exponential(multiplier=1, min=2, max=10), stop=stop_after_attempt(3))
+    @retry(wait=wait_exponential(multiplier=1, min=2, max=10), stop=stop_after_attempt(3),
+           retry=retry_if_exception(_is_retryable_error))
     def generate_content(self, 
                         contents: List[types.Content],
                         stream: bool = False,
                         generation_config: Optional[types.GenerateContentConfig] = None,
                         model: str = "gemini-2.0-flash-exp",
                         return_json: bool = False,
-                        json_schema: Optional[Dict] = None,
-                        count_tokens: bool = False) -> Union[str, Dict, Tuple[Union[str, Dict], TokenCount]]:
+                        json_schema: Optional[Union[Dict, types.Schema]] = None,
+                        count_tokens: bool = False,
+                        regions: Optional[List[str]] = None,
+                        timeout: Optional[float] = None) -> Union[str, Dict, Tuple[Union[str, Dict], TokenCount]]:
         """
         Generate content using Gemini model with region fallback.
         
@@ -199,6 +238,8 @@ class GeminiClient:
             return_json: Whether to return response as JSON using SDK's JSON capability
             json_schema: Optional JSON schema for structured responses
             count_tokens: Whether to count tokens and return token usage
+            regions: Optional list of regions to try, in order (defaults to self.regions)
+            timeout: Optional per-request timeout in seconds
             
         Returns:
             Union[str, Dict]: Generated content as string or JSON if return_json=True
@@ -220,9 +261,9 @@ class GeminiClient:
         if count_tokens:
             token_count = self.count_tokens(contents)
 
-        for region in self.regions:
+        for region in regions or self.regions:
             try:
-                client = self._initialize_client(region)
+                client = self._initialize_client(region, timeout)
                 
                 if stream:
                     response = client.models.generate_content_stream(
@@ -257,6 +298,60 @@ class GeminiClient:
         
         raise Exception(f"All regions failed. Last error: {str(last_error)}") from last_error
 
+    @retry(wait=wait_exponential(multiplier=1, min=2, max=10), stop=stop_after_attempt(3),
+           retry=retry_if_exception(_is_retryable_error))
+    async def generate_content_async(self,
+                                     contents: List[types.Content],
+                                     generation_config: Optional[types.GenerateContentConfig] = None,
+                                     model: str = "gemini-2.0-flash-exp",
+                                     return_json: bool = False,
+                                     json_schema: Optional[Union[Dict, types.Schema]] = None,
+                                     regions: Optional[List[str]] = None,
+                                     timeout: Optional[float] = None) -> str:
+        """
+        Asynchronously generate content using Gemini model with region fallback.
+
+        Args:
+            contents: List of Content objects containing the prompt
+            generation_config: Optional custom generation config
+            model: Model name to use
+            return_json: Whether to return response as JSON using SDK's JSON capability
+            json_schema: Optional JSON schema for structured responses
+            regions: Optional list of regions to try, in order (defaults to self.regions)
+            timeout: Optional per-request timeout in seconds
+
+        Returns:
+            str: Generated content (a JSON string if return_json=True)
+
+        Raises:
+            Exception: If all regions fail
+        """
+        last_error = None
+        gen_config = generation_config or self.default_generation_config
+
+        if return_json:
+            if not json_schema:
+                json_schema = {"type": "OBJECT", "properties": {"response": {"type": "STRING"}}}
+            gen_config.response_mime_type = "application/json"
+            gen_config.response_schema = json_schema
+
+        for region in regions or self.regions:
+            try:
+                client = self._initialize_client(region, timeout)
+                response = await client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=gen_config
+                )
+                return response.text
+
+            except Exception as e:
+                self.logger.warning(f"Error with region {region}: {str(e)}")
+                last_error = e
+                continue
+
+        raise Exception(f"All regions failed. Last error: {str(last_error)}") from last_error
+
 def example_usage():
     """Example usage of the GeminiClient"""
     client = GeminiClient()